@@ -5,17 +5,21 @@ ISEK Node Client Integration with native async support
 """
 
 import os
+import asyncio
+import json
+import orjson
 import uuid
 import logging
+import traceback
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from dataclasses import asdict
 from contextlib import asynccontextmanager
 
-from isek_client import get_client, initialize_client, SessionConfig, MessageConfig, AgentConfig, NetworkStatus
+from isek_client import get_client, initialize_client, SessionConfig, MessageConfig, AgentConfig, NetworkStatus, SessionNotFoundError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +28,17 @@ logger = logging.getLogger(__name__)
 # Global client instance
 client = None
 
+# Text streaming: target characters per "0:" text frame (frames end on a space where one is
+# available, so words are not split), the most frames one reply is split into (longer replies
+# get bigger frames), and how many frames to emit between cooperative yields to the event loop
+# (pacing comes from the consumer, not sleeps)
+STREAM_CHUNK_CHARS = 384
+STREAM_MAX_FRAMES = 64
+STREAM_FRAMES_PER_YIELD = 16
+# Pause between simulated team-formation progress frames. The agent has already answered by the
+# time these are sent, so 0 (a plain yield to the event loop) sends them back to back.
+TEAM_FORMATION_STEP_DELAY = 0.0
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
@@ -35,18 +50,21 @@ async def lifespan(app: FastAPI):
         logger.info("ISEK client initialized successfully")
         yield
     except Exception as e:
-        logger.error(f"Failed to initialize ISEK client: {e}")
+        logger.error("Failed to initialize ISEK client: %s", e)
         yield
     finally:
         # Shutdown
         logger.info("Shutting down ISEK client")
+        if client:
+            await client.shutdown()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
     title="ISEK UI Backend",
     description="ISEK Node Client Integration with native async support",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson encodes the session/message payloads
 )
 
 # Add CORS middleware
@@ -112,6 +130,8 @@ def format_message_response(message: MessageConfig) -> Dict[str, Any]:
     return result
 
 # --- API Endpoints ---
+# List endpoints return ORJSONResponse directly: their payloads are already plain dicts, so this
+# skips FastAPI's jsonable_encoder walk over every session/message before encoding
 
 @app.get("/api/agents")
 async def get_agents(refresh: bool = False):
@@ -120,7 +140,7 @@ async def get_agents(refresh: bool = False):
         agents = await client.discover_agents(force_refresh=refresh)
         return [format_agent_response(agent) for agent in agents]
     except Exception as e:
-        logger.error(f"Failed to get agents: {e}")
+        logger.error("Failed to get agents: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get agents")
 
 @app.get("/api/agents/{agent_id}")
@@ -135,7 +155,7 @@ async def get_agent(agent_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get agent {agent_id}: {e}")
+        logger.error("Failed to get agent %s: %s", agent_id, e)
         raise HTTPException(status_code=404, detail="Agent not found")
 
 @app.get("/api/network/status")
@@ -145,7 +165,7 @@ async def get_network_status():
         status = client.get_network_status()
         return asdict(status)
     except Exception as e:
-        logger.error(f"Failed to get network status: {e}")
+        logger.error("Failed to get network status: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get network status")
 
 @app.get("/api/sessions")
@@ -153,9 +173,9 @@ async def get_sessions(agentId: Optional[str] = None, userId: Optional[str] = No
     """Get all chat sessions, optionally filtered by agent"""
     try:
         sessions = client.get_all_sessions(user_id=userId, node_id=agentId)
-        return [format_session_response(session) for session in sessions]
+        return ORJSONResponse([format_session_response(session) for session in sessions])
     except Exception as e:
-        logger.error(f"Failed to get sessions: {e}")
+        logger.error("Failed to get sessions: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get sessions")
 
 @app.post("/api/sessions")
@@ -177,7 +197,7 @@ async def create_session(request: Dict[str, Any]):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to create session: {e}")
+        logger.error("Failed to create session: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create session")
 
 @app.delete("/api/sessions/{session_id}")
@@ -191,7 +211,7 @@ async def delete_session(session_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to delete session {session_id}: {e}")
+        logger.error("Failed to delete session %s: %s", session_id, e)
         raise HTTPException(status_code=500, detail="Failed to delete session")
 
 @app.get("/api/sessions/{session_id}/messages")
@@ -199,9 +219,9 @@ async def get_messages(session_id: str):
     """Get all messages in session"""
     try:
         messages = client.get_session_messages(session_id)
-        return [format_message_response(message) for message in messages]
+        return ORJSONResponse([format_message_response(message) for message in messages])
     except Exception as e:
-        logger.error(f"Failed to get messages for session {session_id}: {e}")
+        logger.error("Failed to get messages for session %s: %s", session_id, e)
         raise HTTPException(status_code=500, detail="Failed to get messages")
 
 @app.post("/api/sessions/{session_id}/messages")
@@ -223,8 +243,10 @@ async def create_message(session_id: str, request: Dict[str, Any]):
         return format_message_response(message)
     except HTTPException:
         raise
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Session not found")
     except Exception as e:
-        logger.error(f"Failed to create message: {e}")
+        logger.error("Failed to create message: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create message")
 
 @app.delete("/api/sessions/{session_id}/messages")
@@ -238,7 +260,7 @@ async def clear_session_messages(session_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to clear messages for session {session_id}: {e}")
+        logger.error("Failed to clear messages for session %s: %s", session_id, e)
         raise HTTPException(status_code=500, detail="Failed to clear messages")
 
 @app.get("/api/chat")
@@ -249,18 +271,18 @@ async def get_chat_history(sessionId: str):
             raise HTTPException(status_code=400, detail="sessionId is required")
         
         messages = client.get_session_messages(sessionId)
-        return [format_message_response(message) for message in messages]
+        return ORJSONResponse([format_message_response(message) for message in messages])
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get chat history: {e}")
+        logger.error("Failed to get chat history: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get chat history")
 
 @app.post("/api/chat")
 async def chat(request: Request):
     """Chat endpoint - Send message to agent through ISEK node"""
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         session_id = data.get('sessionId')
         messages = data.get('messages', [])
         system = data.get('system', '')
@@ -366,17 +388,16 @@ async def chat(request: Request):
             
     except HTTPException:
         raise
+    except SessionNotFoundError:
+        # Session deleted while the request was in flight
+        raise HTTPException(status_code=404, detail="Session not found")
     except Exception as e:
-        logger.error(f"Chat endpoint error: {e}")
-        import traceback
+        logger.error("Chat endpoint error: %s", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 async def _create_streaming_response(response_data: Dict[str, Any]):
     """Create streaming response for chat"""
-    import asyncio
-    import json
-    
     content = response_data["aiMessage"]["content"]
     
     # Send text content
@@ -384,39 +405,46 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
     if isinstance(content, str):
         text_to_send = content
     elif isinstance(content, list):
-        for part in content:
-            if isinstance(part, dict) and part.get("type") == "text":
-                text_to_send += part.get("text", "")
+        text_to_send = "".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
     elif isinstance(content, dict) and content.get("type") == "text":
         text_to_send = content.get("text", "")
     
-    if text_to_send:
-        chunk_size = 3
-        for i in range(0, len(text_to_send), chunk_size):
-            text_chunk = text_to_send[i:i+chunk_size]
+    if len(text_to_send) <= STREAM_CHUNK_CHARS:
+        if text_to_send:
+            yield f'0:{{"type":"text","text":{json.dumps(text_to_send)}}}\n'
+    else:
+        chunk_chars = max(STREAM_CHUNK_CHARS, -(-len(text_to_send) // STREAM_MAX_FRAMES))
+        for frame, text_chunk in enumerate(_text_chunks(text_to_send, chunk_chars), 1):
             yield f'0:{{"type":"text","text":{json.dumps(text_chunk)}}}\n'
-            await asyncio.sleep(0.04)
+            if frame % STREAM_FRAMES_PER_YIELD == 0:
+                await asyncio.sleep(0)
     
     # Send tool calls if present
     if "tool_calls" in response_data["aiMessage"]:
         tool_calls = response_data["aiMessage"]["tool_calls"]
         
         # 调试信息
-        logger.info(f"🔍 Streaming tool_calls: {tool_calls}")
+        logger.debug("🔍 Streaming tool_calls: %s", tool_calls)
         
         for tool_call in tool_calls:
             tool_name = tool_call.get("function", {}).get("name", "unknown")
             call_id = tool_call.get("id", f"call_{uuid.uuid4().hex[:8]}")
             
             # 调试信息
-            logger.info(f"🔍 Processing tool_call: {tool_call}")
-            logger.info(f"🔍 tool_name: {tool_name}")
-            logger.info(f"🔍 call_id: {call_id}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔍 Processing tool_call: %s", tool_call)
+                logger.debug("🔍 tool_name: %s", tool_name)
+                logger.debug("🔍 call_id: %s", call_id)
             
             # Special handling for team-formation - simulate streaming progress
             if tool_name == "team-formation":
-                async for chunk in _simulate_team_formation_streaming(call_id, tool_call):
-                    yield chunk
+                for frame in _team_formation_frames(call_id, tool_call):
+                    yield frame
+                    await asyncio.sleep(TEAM_FORMATION_STEP_DELAY)
             else:
                 # Regular tool call
                 formatted_tool_call = {
@@ -426,7 +454,6 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
                     "args": tool_call.get("function", {}).get("arguments", {})
                 }
                 yield f'0:{json.dumps(formatted_tool_call)}\n'
-                await asyncio.sleep(0.1)
     
     # Finish response
     finish_data = {
@@ -438,96 +465,72 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
     }
     yield f'd:{json.dumps(finish_data)}\n'
 
-async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str, Any]):
-    """Simulate streaming progress for team formation using server data"""
-    import asyncio
-    import json
-    
+def _text_chunks(text: str, size: int):
+    """Split text into pieces of about size characters, cutting after the last space in each window"""
+    start, end_of_text = 0, len(text)
+    while start < end_of_text:
+        end = start + size
+        if end < end_of_text:
+            cut = text.rfind(" ", start + 1, end)
+            if cut != -1:
+                end = cut + 1
+        yield text[start:end]
+        start = end
+
+def _team_formation_frames(call_id: str, tool_call: Dict[str, Any]):
+    """Simulated team formation progress frames built from server data (the caller paces them)"""
     # Get initial data from server response
     server_args = tool_call.get("function", {}).get("arguments", {})
     initial_members = server_args.get("members", [])
     
     # 调试信息
-    logger.info(f"🔍 Client backend received tool_call: {tool_call}")
-    logger.info(f"🔍 server_args: {server_args}")
-    logger.info(f"🔍 initial_members: {initial_members}")
-    logger.info(f"🔍 initial_members length: {len(initial_members)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 Client backend received tool_call: %s", tool_call)
+        logger.debug("🔍 server_args: %s", server_args)
+        logger.debug("🔍 initial_members: %s", initial_members)
+        logger.debug("🔍 initial_members length: %d", len(initial_members))
     
-    # 如果服务器已经提供了完整的小队数据，直接返回完成状态
-    if server_args.get("status") == "completed" and initial_members:
-        final_args = {
-            **server_args,
-            "members": initial_members,
-            "teamStats": {
-                "totalMembers": len(initial_members),
-                "skills": ["AI图片创作", "数据分析", "智能问答", "流程编排"]
-            }
-        }
-        final_call = {
+    def frame(**args) -> str:
+        """One team-formation tool-call frame; args override the server's arguments"""
+        call = {
             "type": "tool-call",
             "toolCallId": call_id,
-            "toolName": "team-formation", 
-            "args": final_args
+            "toolName": "team-formation",
+            "args": {**server_args, **args}
         }
-        yield f'0:{json.dumps(final_call)}\n'
+        return f'0:{json.dumps(call)}\n'
+    
+    team_stats = {
+        "totalMembers": len(initial_members),
+        "skills": ["AI图片创作", "数据分析", "智能问答", "流程编排"]
+    }
+    
+    # 如果服务器已经提供了完整的小队数据，直接返回完成状态
+    if server_args.get("status") == "completed" and initial_members:
+        yield frame(members=initial_members, teamStats=team_stats)
         return
     
     # Initial call with starting progress
-    initial_call = {
-        "type": "tool-call",
-        "toolCallId": call_id,
-        "toolName": "team-formation",
-        "args": {
-            **server_args,
-            "status": "recruiting",
-            "progress": 0.1,
-            "currentStep": "开始招募小队成员...",
-            "members": []
-        }
-    }
-    yield f'0:{json.dumps(initial_call)}\n'
-    await asyncio.sleep(0.8)
+    yield frame(status="recruiting", progress=0.1, currentStep="开始招募小队成员...", members=[])
     
     # Simulate recruitment progress for each member
-    current_members = []
-    for i, member in enumerate(initial_members):
-        current_members.append(member)
-        progress = 0.2 + (i + 1) * 0.15
-        step = f"已招募 {member['name']} ({member['role']})..."
-        
-        update_call = {
-            "type": "tool-call", 
-            "toolCallId": call_id,
-            "toolName": "team-formation",
-            "args": {
-                **server_args,
-                "status": "recruiting",
-                "progress": progress,
-                "currentStep": step,
-                "members": current_members.copy()
-            }
-        }
-        yield f'0:{json.dumps(update_call)}\n'
-        await asyncio.sleep(0.6)
+    for i, member in enumerate(initial_members, 1):
+        # Frames are serialized immediately, so a slice of the member list replaces copying a growing list
+        yield frame(
+            status="recruiting",
+            progress=0.2 + i * 0.15,
+            currentStep=f"已招募 {member['name']} ({member['role']})...",
+            members=initial_members[:i]
+        )
     
     # Final completion call
-    final_call = {
-        "type": "tool-call",
-        "toolCallId": call_id,
-        "toolName": "team-formation", 
-        "args": {
-            **server_args,
-            "status": "completed",
-            "progress": 1.0,
-            "currentStep": "小队组建完成！",
-            "members": current_members,
-            "teamStats": {
-                "totalMembers": len(current_members),
-                "skills": ["AI图片创作", "数据分析", "智能问答", "流程编排"]
-            }
-        }
-    }
-    yield f'0:{json.dumps(final_call)}\n'
+    yield frame(
+        status="completed",
+        progress=1.0,
+        currentStep="小队组建完成！",
+        members=initial_members,
+        teamStats=team_stats
+    )
 
 @app.get("/health")
 async def health_check():
@@ -552,7 +555,7 @@ async def health_check():
             }
         }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(
             status_code=500, 
             detail={
@@ -565,6 +568,6 @@ async def health_check():
 if __name__ == '__main__':
     import uvicorn
     port = int(5001)
-    logger.info(f"Starting ISEK UI Backend (FastAPI) on port {port}")
+    logger.info("Starting ISEK UI Backend (FastAPI) on port %s", port)
     logger.info("Using native async support with ISEK client integration")
     uvicorn.run(app, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -4,14 +4,23 @@ ISEK Client - Interface to ISEK Node for data retrieval
 """
 
 import asyncio
+import heapq
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Deque, Sequence, Tuple
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from itertools import islice
 from dataclasses import dataclass, field
 from datetime import datetime
-import json
+import orjson
+import re
+import threading
+import time
 import uuid
 import os
 import nest_asyncio
+from sortedcontainers import SortedKeyList
 
 # Fix FastAPI + ISEK Node event loop conflicts
 # FastAPI runs its own event loop, but ISEK's A2AClient uses async methods
@@ -21,7 +30,7 @@ nest_asyncio.apply()
 from isek.node.node_v2 import Node
 from isek.node.etcd_registry import EtcdRegistry
 from shared_formats import (
-    create_chat_message_json, create_session_lifecycle_message_json, 
+    create_chat_message_json, create_session_lifecycle_message_json, create_session_lifecycle_batch_json,
     parse_agent_response, AgentConfig
 )
 
@@ -30,31 +39,91 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string with orjson (node messages are sent as text)"""
+    return orjson.dumps(obj).decode()
+
+_loads = orjson.loads
+
+# (epoch seconds, ISO string) of the last formatted timestamp, swapped as one tuple
+_last_iso: Tuple[float, str] = (0.0, "")
+
+
+def _now_iso() -> str:
+    """datetime.now().isoformat(), reused for calls within the same 10 ms window"""
+    global _last_iso
+    now = time.time()
+    if now - _last_iso[0] > 0.01:
+        _last_iso = (now, datetime.fromtimestamp(now).isoformat())
+    return _last_iso[1]
+
+
+class _IdPool:
+    """Random (version 4) UUID strings cut from one os.urandom read per 64 ids"""
+    __slots__ = ("_buf", "_i", "_lock")
+    _BATCH = 64
+
+    def __init__(self):
+        self._buf = b""
+        self._i = self._BATCH
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            if self._i >= self._BATCH:
+                self._buf = os.urandom(16 * self._BATCH)
+                self._i = 0
+            start = self._i * 16
+            self._i += 1
+        return str(uuid.UUID(bytes=self._buf[start:start + 16], version=4))
+
+_id_pool = _IdPool()
+_new_uuid = _id_pool.next
+
+
+@dataclass(slots=True)
 class SessionLifecycleMessage:
     session_id: str
     action: str
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
-    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    timestamp: str = field(default_factory=_now_iso)
+    request_id: str = field(default_factory=_new_uuid)
 
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from config.json"""
+    """Load configuration from config.json (parsed once per process)"""
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-    with open(config_path, 'r') as f:
-        return json.load(f)
+    with open(config_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+# Keys of a tool call that is already in the shape the frontend expects
+_CANONICAL_TOOL_CALL_KEYS = frozenset(("id", "type", "function"))
+
+def _is_canonical_tool_call(tool_call: Dict[str, Any]) -> bool:
+    """True if a tool call already has exactly the id/type/function shape the frontend expects"""
+    if tool_call.keys() != _CANONICAL_TOOL_CALL_KEYS:
+        return False
+    function = tool_call["function"]
+    return isinstance(function, dict) and "name" in function and "arguments" in function
+
+# Matches a response whose first non-whitespace character opens a JSON object
+_JSON_OBJECT_START = re.compile(r"\s*\{")
+
+# Keywords that make a plain-text reply simulate a team formation tool call (for testing)
+_TEAM_FORMATION_KEYWORDS = ("组队", "小队", "recruit", "team", "招聘", "组建", "协作")
+_TEAM_FORMATION_PATTERN = re.compile("|".join(map(re.escape, _TEAM_FORMATION_KEYWORDS)), re.IGNORECASE)
 
 # --- Data Models ---
 
-@dataclass 
+@dataclass(slots=True)
 class NetworkStatus:
     """Network status data model"""
     connected: bool
     agents_count: int
-    last_updated: str = field(default_factory=lambda: datetime.now().isoformat())
+    last_updated: str = field(default_factory=_now_iso)
     node_id: Optional[str] = None
     node_address: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class SessionConfig:
     """Session configuration data model"""
     id: str
@@ -63,25 +132,28 @@ class SessionConfig:
     agent_name: str
     agent_description: str
     agent_address: str
-    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
-    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    created_at: str = field(default_factory=_now_iso)
+    updated_at: str = field(default_factory=_now_iso)
     message_count: int = 0
     user_id: Optional[str] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class MessageConfig:
     """Message configuration data model"""
     id: str
     session_id: str
     content: str
     role: str  # "user" or "assistant"
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: str = field(default_factory=_now_iso)
     metadata: Dict[str, Any] = field(default_factory=dict)
     tool_calls: Optional[List[Dict[str, Any]]] = None
     tool_results: Optional[List[Dict[str, Any]]] = None
 
 
+class SessionNotFoundError(ValueError):
+    """Raised when a session id is not (or no longer) known to this client"""
+
 
 # --- ISEK Client Class ---
 
@@ -101,11 +173,34 @@ class ISEKClient:
         self.node = None
         self.etcd_registry = None
         self._agents_cache: List[AgentConfig] = []
-        self._agents_cache_time: Optional[datetime] = None
+        self._agents_by_id: Dict[str, AgentConfig] = {}  # node_id index over _agents_cache
+        self._agents_cache_time: Optional[float] = None  # time.monotonic() of last discovery
         self._cache_ttl_seconds: int = 300  # 5分钟缓存
+        # (agent node_id, user_id) -> (time.monotonic() of fetch, remote session dicts)
+        self._remote_sessions_cache: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._remote_sessions_ttl_seconds: float = config.get("remote_sessions_cache_ttl", 30)
         self._network_status: NetworkStatus = NetworkStatus(connected=False, agents_count=0)
         self._sessions_cache: Dict[str, SessionConfig] = {}
+        # Same sessions ordered by updated_at (ISO strings sort chronologically); newest last
+        self._sessions_by_updated: SortedKeyList = SortedKeyList(key=lambda s: s.updated_at)
+        # Full per-session history; only the prompt window sent to the agent is bounded
         self._messages_cache: Dict[str, List[MessageConfig]] = {}
+        # Messages of history sent with each chat (the server keeps the same HISTORY_WINDOW)
+        self._prompt_history_window: int = config.get("prompt_history_window", 10)
+        # Serialized entries for the last _prompt_history_window messages, so each message is encoded once
+        self._history_json_cache: Dict[str, Deque[str]] = {}
+        # node_id -> ((knowledge, routine), assembled default system prompt)
+        self._system_prompt_cache: Dict[str, Tuple[Tuple[str, str], str]] = {}
+        # Lifecycle events queued per agent node_id, sent as one message per node after a short window
+        self._pending_lifecycle: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        self._lifecycle_flush: Optional[asyncio.Future] = None
+        self._lifecycle_batch_window: float = config.get("lifecycle_batch_window", 0.005)
+        # Dedicated, bounded pool for the blocking node.send_message calls (long retries stay off the default executor)
+        self._send_pool = ThreadPoolExecutor(
+            max_workers=config.get("send_workers", 32), thread_name_prefix="isek-send"
+        )
+        # Background notification tasks, referenced until done so they are not garbage collected
+        self._inflight: set = set()
         
     async def initialize_node(self):
         """Initialize ISEK node with etcd registry"""
@@ -125,24 +220,47 @@ class ISEKClient:
                 node_id=self.node_id,
                 node_address=f"{self.registry_host}:{self.registry_port}"
             )
-            logger.info(f"Initialized ISEK node with ID: {self.node_id} and registry: {self.registry_host}:{self.registry_port}")
+            logger.info("Initialized ISEK node with ID: %s and registry: %s:%s", self.node_id, self.registry_host, self.registry_port)
         except Exception as e:
-            logger.error(f"Failed to initialize ISEK node: {e}")
+            logger.error("Failed to initialize ISEK node: %s", e)
             self._network_status = NetworkStatus(connected=False, agents_count=0)
     
+    async def _send(self, node_id: str, message: str, **kwargs) -> str:
+        """node.send_message on the send pool, without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._send_pool, functools.partial(self.node.send_message, node_id, message, **kwargs)
+        )
+    
+    def _set_agents_cache(self, agents: List[AgentConfig]):
+        """Replace the agents cache together with its node_id index"""
+        self._agents_by_id = {agent.node_id: agent for agent in agents}
+        self._agents_cache = agents
+        self._network_status.agents_count = len(agents)
+    
+    def _agent_from_metadata(self, node_id: str, metadata: Dict[str, Any]) -> AgentConfig:
+        """Build an agent config from the adapter card fields in registry metadata"""
+        return AgentConfig(
+            name=metadata.get('name', node_id),
+            node_id=node_id,
+            bio=metadata.get('bio', f"Agent {node_id}"),
+            lore=metadata.get('lore', ''),
+            knowledge=metadata.get('knowledge', ''),
+            routine=metadata.get('routine', ''),
+            address=metadata.get('url', '')
+        )
+    
     def _is_cache_valid(self) -> bool:
         """Check if agents cache is still valid"""
-        if not self._agents_cache_time:
+        if self._agents_cache_time is None:
             return False
-        elapsed = (datetime.now() - self._agents_cache_time).total_seconds()
-        return elapsed < self._cache_ttl_seconds
+        return time.monotonic() - self._agents_cache_time < self._cache_ttl_seconds
     
     async def discover_agents(self, force_refresh: bool = False) -> List[AgentConfig]:
         """Discover available agents through ISEK node registry"""
         try:
             # Return cached results if valid and not forced refresh
             if not force_refresh and self._is_cache_valid() and self._agents_cache:
-                logger.info(f"Returning cached agents: {len(self._agents_cache)} agents")
+                logger.info("Returning cached agents: %d agents", len(self._agents_cache))
                 return self._agents_cache
             
             if not self._network_status.connected:
@@ -151,107 +269,71 @@ class ISEKClient:
             # Get all nodes from registry
             if self.node and hasattr(self.node, 'all_nodes'):
                 all_nodes: Dict[str, Dict[str, Any]] = self.node.all_nodes
-                logger.info(f"Found {len(all_nodes)} total nodes in registry")
+                logger.info("Found %d total nodes in registry", len(all_nodes))
                 agents = []
+                # (slot in agents, node_id, metadata) for agents whose card must be requested
+                pending = []
                 
                 for node_id, node_details in all_nodes.items():
-                    # Check what's in metadata
-                    metadata = node_details.get('metadata', {})
                     if node_id != self.node_id:  # Exclude self
                         # Check if we have adapter card info in metadata
                         metadata = node_details.get('metadata', {})
                         
                         # If metadata has adapter card info, use it directly
                         if metadata.get('name') and metadata.get('bio'):
-                            agent = AgentConfig(
-                                name=metadata.get('name', node_id),
+                            agents.append(self._agent_from_metadata(node_id, metadata))
+                        else:
+                            # Keep registry order - the slot is filled once the agent answers
+                            pending.append((len(agents), node_id, metadata))
+                            agents.append(None)
+                
+                # Request adapter card info from all remaining agents concurrently
+                responses = await asyncio.gather(*(
+                    self._send(node_id, _dumps({"type": "agent_config_request", "node_id": node_id}))
+                    for _, node_id, _ in pending
+                ), return_exceptions=True)
+                
+                for (slot, node_id, metadata), agent_config_response in zip(pending, responses):
+                    if isinstance(agent_config_response, Exception):
+                        logger.warning("Failed to get agent config from %s: %s", node_id, agent_config_response)
+                        # Fallback to metadata
+                        agents[slot] = self._agent_from_metadata(node_id, metadata)
+                    elif agent_config_response and agent_config_response.strip():
+                        try:
+                            config_data = _loads(agent_config_response)
+                            
+                            agents[slot] = AgentConfig(
+                                name=config_data.get('name', node_id),
                                 node_id=node_id,
-                                bio=metadata.get('bio', f"Agent {node_id}"),
-                                lore=metadata.get('lore', ''),
-                                knowledge=metadata.get('knowledge', ''),
-                                routine=metadata.get('routine', ''),
+                                bio=config_data.get('bio', ''),
+                                lore=config_data.get('lore', ''),
+                                knowledge=config_data.get('knowledge', ''),
+                                routine=config_data.get('routine', ''),
                                 address=metadata.get('url', '')
                             )
-                            agents.append(agent)
-                        else:
-                            # Request adapter card info from the agent
-                            try:
-                                request_message = json.dumps({
-                                    "type": "agent_config_request",
-                                    "node_id": node_id
-                                })
-                                
-                                agent_config_response = self.node.send_message(node_id, request_message)
-                                
-                                if agent_config_response and agent_config_response.strip():
-                                    try:
-                                        config_data = json.loads(agent_config_response)
-                                        
-                                        agent = AgentConfig(
-                                            name=config_data.get('name', node_id),
-                                            node_id=node_id,
-                                            bio=config_data.get('bio', ''),
-                                            lore=config_data.get('lore', ''),
-                                            knowledge=config_data.get('knowledge', ''),
-                                            routine=config_data.get('routine', ''),
-                                            address=metadata.get('url', '')
-                                        )
-                                        agents.append(agent)
-                                    except json.JSONDecodeError as json_err:
-                                        logger.warning(f"Failed to parse agent config for {node_id}")
-                                        # Fallback to metadata or basic info
-                                        agent = AgentConfig(
-                                            name=metadata.get('name', node_id),
-                                            node_id=node_id,
-                                            bio=metadata.get('bio', f"Agent {node_id}"),
-                                            lore=metadata.get('lore', ''),
-                                            knowledge=metadata.get('knowledge', ''),
-                                            routine=metadata.get('routine', ''),
-                                            address=metadata.get('url', '')
-                                        )
-                                        agents.append(agent)
-                                else:
-                                    # Fallback to metadata
-                                    agent = AgentConfig(
-                                        name=metadata.get('name', node_id),
-                                        node_id=node_id,
-                                        bio=metadata.get('bio', f"Agent {node_id}"),
-                                        lore=metadata.get('lore', ''),
-                                        knowledge=metadata.get('knowledge', ''),
-                                        routine=metadata.get('routine', ''),
-                                        address=metadata.get('url', '')
-                                    )
-                                    agents.append(agent)
-                            except Exception as e:
-                                logger.warning(f"Failed to get agent config from {node_id}: {e}")
-                                # Fallback to metadata
-                                agent = AgentConfig(
-                                    name=metadata.get('name', node_id),
-                                    node_id=node_id,
-                                    bio=metadata.get('bio', f"Agent {node_id}"),
-                                    lore=metadata.get('lore', ''),
-                                    knowledge=metadata.get('knowledge', ''),
-                                    routine=metadata.get('routine', ''),
-                                    address=metadata.get('url', '')
-                                )
-                                agents.append(agent)
+                        except orjson.JSONDecodeError:
+                            logger.warning("Failed to parse agent config for %s", node_id)
+                            # Fallback to metadata or basic info
+                            agents[slot] = self._agent_from_metadata(node_id, metadata)
+                    else:
+                        # Fallback to metadata
+                        agents[slot] = self._agent_from_metadata(node_id, metadata)
                 
-                self._agents_cache = agents
-                self._agents_cache_time = datetime.now()
-                self._network_status.agents_count = len(agents)
-                logger.info(f"Discovered {len(agents)} agents through registry")
+                self._set_agents_cache(agents)
+                self._agents_cache_time = time.monotonic()
+                logger.info("Discovered %d agents through registry", len(agents))
                 return agents
             else:
                 logger.warning("Node not initialized or all_nodes not available")
                 return []
             
         except Exception as e:
-            logger.error(f"Failed to discover agents: {e}")
+            logger.error("Failed to discover agents: %s", e)
             return []
     
     def get_agent_by_id(self, node_id: str) -> Optional[AgentConfig]:
         """Get specific agent by node_id from cache"""
-        return next((agent for agent in self._agents_cache if agent.node_id == node_id), None)
+        return self._agents_by_id.get(node_id)
     
     def get_network_status(self) -> NetworkStatus:
         """Get current network connection status"""
@@ -271,52 +353,49 @@ class ISEKClient:
             if not self.node:
                 await self.initialize_node()
             
-            # Get conversation history and latest user message
-            history = self.get_conversation_history(session_id)
-            user_message = ""
-            for msg in reversed(history):
-                if msg["role"] == "user":
-                    user_message = msg["content"]
-                    break
+            # Latest user message; the history itself is already serialized per message
+            user_message = next(
+                (msg.content for msg in reversed(self.get_session_messages(session_id)) if msg.role == "user"), ""
+            )
             
             # Create standardized message using client's node_id as user_id
             message = create_chat_message_json(
                 session_id=session_id,
                 user_id=self.node_id,  # client's node_id is user_id
-                messages=history,
-                system_prompt=system_prompt or f"{agent.knowledge}\n\nRoutine: {agent.routine}",
-                user_message=user_message
+                messages=[],
+                system_prompt=system_prompt or self._get_default_system_prompt(agent),
+                user_message=user_message,
+                messages_json=f"[{', '.join(self._history_json_cache.get(session_id, ()))}]"
             )
             
             # Send to agent (agent.node_id is the server's node_id)
-            logger.info(f"Sending message to agent {agent.node_id}")
+            logger.info("Sending message to agent %s", agent.node_id)
             
             try:
-                # Send message to ISEK node
-                # nest_asyncio enables this to work within FastAPI's event loop
-                response = self.node.send_message(agent.node_id, message, retry_count=5)
-                logger.info(f"Received response: {repr(response)}")
+                # Send message to ISEK node - blocking call, keep it off the event loop
+                response = await self._send(agent.node_id, message, retry_count=5)
+                logger.info("Received response: %r", response)
                 
                 # Check if response indicates delivery failure
                 if response and "Message delivery" in response and "failed" in response:
-                    logger.error(f"Message delivery failed: {response}")
+                    logger.error("Message delivery failed: %s", response)
                     # Try to refresh agent cache and reconnect before giving up
                     logger.info("Attempting to refresh agents and retry once more...")
                     await self.discover_agents(force_refresh=True)
                     
                     # One more attempt with fresh agent data
                     try:
-                        response = self.node.send_message(agent.node_id, message, retry_count=3)
+                        response = await self._send(agent.node_id, message, retry_count=3)
                         if response and "Message delivery" in response and "failed" in response:
                             return f"Error: Unable to reach agent {agent.name}. The agent may be offline or unreachable."
                     except Exception as retry_error:
-                        logger.error(f"Retry attempt failed: {retry_error}")
+                        logger.error("Retry attempt failed: %s", retry_error)
                         return f"Error: Unable to reach agent {agent.name}. The agent may be offline or unreachable."
                 
                 if response:
                     # Parse standardized response
                     parsed_response = parse_agent_response(response)
-                    logger.info(f"Parsed response: {parsed_response}")
+                    logger.info("Parsed response: %s", parsed_response)
                     if parsed_response["success"]:
                         return parsed_response["content"]
                     else:
@@ -326,13 +405,22 @@ class ISEKClient:
                 return "Error: No response from agent"
                 
             except Exception as send_error:
-                logger.error(f"Exception during message send: {send_error}")
+                logger.error("Exception during message send: %s", send_error)
                 return f"Error: Failed to communicate with agent {agent.name}"
                 
         except Exception as e:
-            logger.error(f"Failed to send message for session {session_id}: {e}")
+            logger.error("Failed to send message for session %s: %s", session_id, e)
             return "Error: Unable to communicate with agent"
     
+    def _get_default_system_prompt(self, agent: AgentConfig) -> str:
+        """Default system prompt for an agent, rebuilt only when its card changes"""
+        key = (agent.knowledge, agent.routine)
+        cached = self._system_prompt_cache.get(agent.node_id)
+        if cached is None or cached[0] != key:
+            cached = (key, f"{agent.knowledge}\n\nRoutine: {agent.routine}")
+            self._system_prompt_cache[agent.node_id] = cached
+        return cached[1]
+    
     def is_agent_available(self, node_id: str) -> bool:
         """Check if agent is available"""
         agent = self.get_agent_by_id(node_id)
@@ -344,8 +432,8 @@ class ISEKClient:
         """Parse agent response to extract content and tool calls"""
         try:
             # Try to parse as JSON first
-            if response.strip().startswith('{'):
-                data = json.loads(response)
+            if _JSON_OBJECT_START.match(response):
+                data = _loads(response)
                 return {
                     "content": data.get("content", response),
                     "tool_calls": data.get("tool_calls", []),
@@ -362,7 +450,7 @@ class ISEKClient:
                     "tool_calls": [],
                     "success": True
                 }
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             # If not valid JSON, treat as plain text
             # Check for team formation keywords to simulate tool calls (for testing)
             if self._should_trigger_team_formation(response):
@@ -376,13 +464,12 @@ class ISEKClient:
     
     def _should_trigger_team_formation(self, response: str) -> bool:
         """Check if response should trigger team formation tool call (for testing)"""
-        keywords = ["组队", "小队", "recruit", "team", "招聘", "组建", "协作"]
-        return any(keyword in response.lower() for keyword in keywords)
+        return _TEAM_FORMATION_PATTERN.search(response) is not None
     
     def _simulate_team_formation_response(self, original_response: str) -> Dict[str, Any]:
         """Simulate team formation tool call response (for testing)"""
         tool_call = {
-            "id": f"call_{uuid.uuid4().hex[:8]}",
+            "id": f"call_{_new_uuid()[:8]}",
             "type": "function",
             "function": {
                 "name": "team-formation",
@@ -402,28 +489,29 @@ class ISEKClient:
     
     def format_tool_calls_for_frontend(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Format tool calls for frontend consumption"""
-        formatted_calls = []
-        for tool_call in tool_calls:
-            # Preserve all function data to maintain complete tool call information including members
-            formatted_call = {
-                "id": tool_call.get("id", str(uuid.uuid4())),
+        return [
+            # Already in frontend shape - pass the original through untouched
+            tool_call if _is_canonical_tool_call(tool_call) else {
+                # Only mint an id when the call has none
+                "id": tool_call["id"] if "id" in tool_call else _new_uuid(),
                 "type": tool_call.get("type", "function"),
+                # Preserve all function data to maintain complete tool call information including members
                 "function": tool_call.get("function", {})
             }
-            formatted_calls.append(formatted_call)
-        return formatted_calls
+            for tool_call in tool_calls
+        ]
     
     # --- Session Management Methods ---
     
     def create_session(self, node_id: str, title: str = None, user_id: str = None) -> SessionConfig:
         """Create a new chat session"""
-        logger.info(f"Creating session for node {node_id}, title: {title}")
+        logger.info("Creating session for node %s, title: %s", node_id, title)
         agent = self.get_agent_by_id(node_id)
         if not agent:
-            logger.error(f"Agent {node_id} not found")
+            logger.error("Agent %s not found", node_id)
             raise ValueError(f"Agent {node_id} not found")
         
-        session_id = str(uuid.uuid4())
+        session_id = _new_uuid()
         session = SessionConfig(
             id=session_id,
             title=title or f"Chat with {agent.name}",
@@ -435,19 +523,15 @@ class ISEKClient:
         )
         
         self._sessions_cache[session_id] = session
+        self._sessions_by_updated.add(session)
         self._messages_cache[session_id] = []
+        self._history_json_cache[session_id] = deque(maxlen=self._prompt_history_window)
+        self._invalidate_remote_sessions(node_id)
         
-        logger.info(f"Created session {session_id} for agent {agent.name} ({node_id})")
+        logger.info("Created session %s for agent %s (%s)", session_id, agent.name, node_id)
         
         # Notify agent about new session (run in background)
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self._notify_agent_session_created(node_id, session_id))
-            else:
-                asyncio.run(self._notify_agent_session_created(node_id, session_id))
-        except Exception as e:
-            logger.warning(f"Failed to schedule session creation notification: {e}")
+        self._schedule_notification(self._notify_agent_session_created(node_id, session_id), "creation")
         
         return session
     
@@ -456,63 +540,69 @@ class ISEKClient:
         return self._sessions_cache.get(session_id)
     
     def get_all_sessions(self, user_id: str = None, node_id: str = None) -> List[SessionConfig]:
-        """Get all sessions from local cache only (fast)"""
-        sessions = list(self._sessions_cache.values())
-        
-        if user_id:
-            sessions = [s for s in sessions if s.user_id == user_id]
-        if node_id:
-            sessions = [s for s in sessions if s.node_id == node_id]
-        
-        # Update message counts
-        for session in sessions:
-            session.message_count = len(self._messages_cache.get(session.id, []))
-        
-        return sessions
+        """Get all sessions from local cache only (fast), most recently updated first"""
+        # message_count is maintained by add_message / clear_session_messages
+        return [
+            s for s in reversed(self._sessions_by_updated)
+            if (not user_id or s.user_id == user_id) and (not node_id or s.node_id == node_id)
+        ]
+    
+    def _touch_session(self, session: SessionConfig):
+        """Bump a session's updated_at, keeping _sessions_by_updated ordered"""
+        self._sessions_by_updated.remove(session)
+        session.updated_at = _now_iso()
+        self._sessions_by_updated.add(session)
     
     async def get_all_sessions_distributed(self, user_id: str = None, node_id: str = None) -> List[SessionConfig]:
         """Get all sessions including from remote agents (slower but comprehensive)"""
         # 先获取本地缓存
         local_sessions = self.get_all_sessions(user_id=user_id, node_id=node_id)
-        all_sessions = list(local_sessions)
+        remote_sessions: List[SessionConfig] = []
         
         # 如果网络连接可用，查询远程节点
         if self.node and self._network_status.connected and self._agents_cache:
             current_user_id = user_id or self.node_id
             
             # 并发查询所有agents（优化性能）
-            import asyncio
-            
             async def query_agent(agent):
                 if node_id and agent.node_id != node_id:
                     return []
                 
+                cache_key = (agent.node_id, current_user_id)
+                cached = self._remote_sessions_cache.get(cache_key)
+                if cached and time.monotonic() - cached[0] < self._remote_sessions_ttl_seconds:
+                    return cached[1]
+                
                 try:
-                    request_message = json.dumps({
+                    request_message = _dumps({
                         "type": "session_list_request",
                         "user_id": current_user_id,
-                        "timestamp": datetime.now().isoformat(),
-                        "request_id": str(uuid.uuid4())
+                        "timestamp": _now_iso(),
+                        "request_id": _new_uuid()
                     })
                     
-                    # 使用超时来避免阻塞
-                    response = self.node.send_message(agent.node_id, request_message)
+                    # 在线程中发送，避免阻塞事件循环
+                    response = await self._send(agent.node_id, request_message)
                     if response and not ("Error:" in response and "failed" in response):
-                        session_data = json.loads(response)
-                        if session_data.get("success") and session_data.get("sessions"):
-                            return session_data["sessions"]
+                        session_data = _loads(response)
+                        if session_data.get("success"):
+                            sessions = session_data.get("sessions") or []
+                            self._remote_sessions_cache[cache_key] = (time.monotonic(), sessions)
+                            return sessions
                 except Exception as e:
-                    logger.warning(f"Failed to get sessions from {agent.node_id}: {e}")
+                    logger.warning("Failed to get sessions from %s: %s", agent.node_id, e)
                 return []
             
-            # 并发查询所有agents
-            tasks = [query_agent(agent) for agent in self._agents_cache]
+            # 并发查询所有agents (snapshot - a concurrent discovery may swap the cache meanwhile)
+            agents = self._agents_cache
+            tasks = [query_agent(agent) for agent in agents]
             try:
                 results = await asyncio.gather(*tasks, return_exceptions=True)
+                seen_ids = {s.id for s in local_sessions}
                 
                 for i, result in enumerate(results):
                     if isinstance(result, list):
-                        agent = self._agents_cache[i]
+                        agent = agents[i]
                         for remote_session in result:
                             session = SessionConfig(
                                 id=remote_session.get("id", ""),
@@ -528,39 +618,40 @@ class ISEKClient:
                             )
                             
                             # 检查是否已存在于本地缓存中，避免重复
-                            if not any(s.id == session.id for s in all_sessions):
-                                all_sessions.append(session)
+                            if session.id not in seen_ids:
+                                remote_sessions.append(session)
+                                seen_ids.add(session.id)
                                 
             except Exception as e:
-                logger.error(f"Error in distributed session query: {e}")
+                logger.error("Error in distributed session query: %s", e)
         
-        # 按更新时间排序
-        all_sessions.sort(key=lambda s: s.updated_at, reverse=True)
-        return all_sessions
+        # 按更新时间排序 - local sessions are already ordered, only the remote ones need sorting
+        if not remote_sessions:
+            return local_sessions
+        remote_sessions.sort(key=lambda s: s.updated_at, reverse=True)
+        return list(heapq.merge(local_sessions, remote_sessions, key=lambda s: s.updated_at, reverse=True))
+    
+    def _invalidate_remote_sessions(self, node_id: str):
+        """Drop cached remote session lists for an agent after its sessions change"""
+        for key in [key for key in self._remote_sessions_cache if key[0] == node_id]:
+            del self._remote_sessions_cache[key]
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its messages"""
-        if session_id not in self._sessions_cache:
+        session = self._sessions_cache.pop(session_id, None)
+        if session is None:
             # Session不在缓存中，可能已被删除或缓存失效，但仍返回True避免404错误
-            logger.warning(f"Session {session_id} not found in cache, treating as already deleted")
+            logger.warning("Session %s not found in cache, treating as already deleted", session_id)
             return True
         
-        session = self._sessions_cache[session_id]
         node_id = session.node_id
-        
-        del self._sessions_cache[session_id]
-        if session_id in self._messages_cache:
-            del self._messages_cache[session_id]
+        self._sessions_by_updated.discard(session)
+        self._invalidate_remote_sessions(node_id)
+        self._messages_cache.pop(session_id, None)
+        self._history_json_cache.pop(session_id, None)
         
         # Notify agent about session deletion (run in background)
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self._notify_agent_session_deleted(node_id, session_id))
-            else:
-                asyncio.run(self._notify_agent_session_deleted(node_id, session_id))
-        except Exception as e:
-            logger.warning(f"Failed to schedule session deletion notification: {e}")
+        self._schedule_notification(self._notify_agent_session_deleted(node_id, session_id), "deletion")
         
         return True
     
@@ -569,11 +660,12 @@ class ISEKClient:
     def add_message(self, session_id: str, content: str, role: str, metadata: Dict[str, Any] = None, 
                     tool_calls: List[Dict[str, Any]] = None, tool_results: List[Dict[str, Any]] = None) -> MessageConfig:
         """Add a message to a session"""
-        if session_id not in self._sessions_cache:
-            raise ValueError(f"Session {session_id} not found")
+        session = self._sessions_cache.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Session {session_id} not found")
         
         message = MessageConfig(
-            id=str(uuid.uuid4()),
+            id=_new_uuid(),
             session_id=session_id,
             content=content,
             role=role,
@@ -582,19 +674,26 @@ class ISEKClient:
             tool_results=tool_results
         )
         
-        if session_id not in self._messages_cache:
-            self._messages_cache[session_id] = []
+        messages = self._messages_cache.get(session_id)
+        if messages is None:
+            messages = self._messages_cache[session_id] = []
+            self._history_json_cache[session_id] = deque(maxlen=self._prompt_history_window)
         
-        self._messages_cache[session_id].append(message)
+        messages.append(message)
+        # Same shape as get_conversation_history entries; the deque keeps only the prompt window
+        self._history_json_cache[session_id].append(_dumps({
+            "role": message.role,
+            "content": message.content,
+            "timestamp": message.timestamp
+        }))
         
         # Update session
-        session = self._sessions_cache[session_id]
-        session.updated_at = datetime.now().isoformat()
-        session.message_count = len(self._messages_cache[session_id])
+        self._touch_session(session)
+        session.message_count += 1
         
         return message
     
-    def get_session_messages(self, session_id: str) -> List[MessageConfig]:
+    def get_session_messages(self, session_id: str) -> Sequence[MessageConfig]:
         """
         Get all messages in a session
         
@@ -602,9 +701,9 @@ class ISEKClient:
             session_id: Session identifier
             
         Returns:
-            List of MessageConfig objects
+            All MessageConfig objects in the session, oldest first
         """
-        return self._messages_cache.get(session_id, [])
+        return self._messages_cache.get(session_id, ())
     
     
     def clear_session_messages(self, session_id: str) -> bool:
@@ -617,27 +716,21 @@ class ISEKClient:
         Returns:
             True if cleared successfully, False if session not found
         """
-        if session_id not in self._sessions_cache:
+        session = self._sessions_cache.get(session_id)
+        if session is None:
             return False
         
-        session = self._sessions_cache[session_id]
         node_id = session.node_id
         
         self._messages_cache[session_id] = []
+        self._history_json_cache[session_id] = deque(maxlen=self._prompt_history_window)
         
         # Update session message count and timestamp
         session.message_count = 0
-        session.updated_at = datetime.now().isoformat()
+        self._touch_session(session)
         
         # Notify agent to clear server-side session (run in background)
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(self._notify_agent_session_cleared(node_id, session_id))
-            else:
-                asyncio.run(self._notify_agent_session_cleared(node_id, session_id))
-        except Exception as e:
-            logger.warning(f"Failed to schedule session clear notification: {e}")
+        self._schedule_notification(self._notify_agent_session_cleared(node_id, session_id), "clear")
         
         return True
     
@@ -655,7 +748,8 @@ class ISEKClient:
         messages = self.get_session_messages(session_id)
         
         if limit:
-            messages = messages[-limit:]  # Get most recent messages
+            # Walk back from the newest message so only `limit` entries are touched
+            messages = list(islice(reversed(messages), limit))[::-1]
         
         return [
             {
@@ -682,7 +776,7 @@ class ISEKClient:
         if not session:
             return {}
         
-        messages = self._messages_cache.get(session_id, [])
+        messages = self._messages_cache.get(session_id, ())
         user_messages = [m for m in messages if m.role == "user"]
         assistant_messages = [m for m in messages if m.role == "assistant"]
         
@@ -702,43 +796,97 @@ class ISEKClient:
     
     # --- Agent Session Notification Methods ---
     
+    def _schedule_notification(self, coro, what: str):
+        """Run a notification in the background on the running loop (inline if there is none)"""
+        try:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Called from sync code with no loop in this thread
+                asyncio.run(coro)
+                return
+            task = loop.create_task(coro)
+            self._inflight.add(task)
+            task.add_done_callback(self._on_notification_done)
+        except Exception as e:
+            logger.warning("Failed to schedule session %s notification: %s", what, e)
+    
+    def _on_notification_done(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Session notification failed: %s", task.exception())
+    
+    async def flush_notifications(self):
+        """Wait for background lifecycle notifications to finish (call before shutdown)"""
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+    
+    async def shutdown(self):
+        """Flush pending notifications, then release the send pool threads"""
+        await self.flush_notifications()
+        # Nothing new is submitted after this; queued sends are dropped, running ones finish on their own
+        self._send_pool.shutdown(wait=False, cancel_futures=True)
+    
     async def _notify_agent_lifecycle(self, node_id: str, session_id: str, action: str):
-        """Unified method to notify agent about session lifecycle events using standardized format"""
+        """Unified method to notify agent about session lifecycle events using standardized format
+
+        Events are queued and coalesced per node; the first caller in a batch window starts the flush
+        task and waits on it.
+        """
         try:
-            logger.info(f"Attempting to notify node {node_id} about session {session_id} {action}")
+            logger.info("Queueing notification to node %s about session %s %s", node_id, session_id, action)
             
             if not self._network_status.connected:
-                logger.warning(f"Network not connected, skipping notification for session {action}")
+                logger.warning("Network not connected, skipping notification for session %s", action)
                 return
             
             if not self.node:
-                logger.warning(f"Node not initialized, skipping notification for session {action}")
+                logger.warning("Node not initialized, skipping notification for session %s", action)
                 return
             
-            # Create standardized session lifecycle message
+            self._pending_lifecycle[node_id].append({"session_id": session_id, "action": action})
+            if self._lifecycle_flush is None:
+                # Tracked like other background notifications so shutdown waits for it
+                self._lifecycle_flush = asyncio.get_running_loop().create_task(self._flush_lifecycle())
+                self._inflight.add(self._lifecycle_flush)
+                self._lifecycle_flush.add_done_callback(self._on_notification_done)
+                # Shielded: cancelling this caller must not cancel the flush carrying other callers' events
+                await asyncio.shield(self._lifecycle_flush)
+        except Exception:
+            logger.exception("Failed to notify node %s about session %s", node_id, action)
+    
+    async def _flush_lifecycle(self):
+        """Wait out the batch window, then send the queued lifecycle events to each node concurrently"""
+        try:
+            await asyncio.sleep(self._lifecycle_batch_window)
+        finally:
+            pending, self._pending_lifecycle = self._pending_lifecycle, defaultdict(list)
+            self._lifecycle_flush = None
+        await asyncio.gather(*(self._send_lifecycle(node_id, events) for node_id, events in pending.items()))
+    
+    async def _send_lifecycle(self, node_id: str, events: List[Dict[str, str]]):
+        """Send one node its lifecycle events - a plain lifecycle message when there is only one"""
+        agent = self.get_agent_by_id(node_id)
+        if not agent:
+            logger.warning("Node %s not found in cache, skipping %d notification(s)", node_id, len(events))
+            return
+        
+        if len(events) == 1:
             message_string = create_session_lifecycle_message_json(
-                session_id=session_id,
+                session_id=events[0]["session_id"],
                 user_id=self.node_id,  # client's node_id as user_id
-                action=action
+                action=events[0]["action"]
             )
-            logger.info(f"Created lifecycle message: {message_string}")
-            
-            agent = self.get_agent_by_id(node_id)
-            if agent:
-                logger.info(f"Sending message to node {agent.node_id}")
-                # Send lifecycle notification to ISEK node
-                # nest_asyncio enables direct async calls in FastAPI context
-                try:
-                    response = self.node.send_message(agent.node_id, message_string, retry_count=3)
-                    logger.info(f"Notified node {node_id} about session {session_id} {action}, response: {response}")
-                except Exception as e:
-                    logger.warning(f"Failed to notify node {node_id}: {e}")
-            else:
-                logger.warning(f"Node {node_id} not found in cache, skipping notification")
+        else:
+            message_string = create_session_lifecycle_batch_json(user_id=self.node_id, events=events)
+        logger.info("Created lifecycle message: %s", message_string)
+        
+        # Send lifecycle notification to ISEK node without blocking the event loop
+        try:
+            response = await self._send(agent.node_id, message_string, retry_count=3)
+            logger.info("Notified node %s about %d session event(s), response: %s", node_id, len(events), response)
         except Exception as e:
-            logger.error(f"Failed to notify node {node_id} about session {action}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.warning("Failed to notify node %s: %s", node_id, e)
     
     async def _notify_agent_session_created(self, node_id: str, session_id: str):
         await self._notify_agent_lifecycle(node_id, session_id, "created")
@@ -752,6 +900,7 @@ class ISEKClient:
 # --- Client Factory ---
 
 _client_instance = None
+_client_lock = threading.Lock()
 
 def get_client(node_id: str = None, registry_host: str = None, registry_port: int = None) -> ISEKClient:
     """
@@ -767,7 +916,9 @@ def get_client(node_id: str = None, registry_host: str = None, registry_port: in
     """
     global _client_instance
     if _client_instance is None:
-        _client_instance = ISEKClient(node_id=node_id, registry_host=registry_host, registry_port=registry_port)
+        with _client_lock:
+            if _client_instance is None:
+                _client_instance = ISEKClient(node_id=node_id, registry_host=registry_host, registry_port=registry_port)
     return _client_instance
 
 async def initialize_client():
@@ -777,5 +928,8 @@ async def initialize_client():
     await client.discover_agents()
     return client
 
-# For backwards compatibility
-isek_client = get_client()
\ No newline at end of file
+def __getattr__(name: str):
+    """Resolve the legacy module-level ``isek_client`` lazily on first access"""
+    if name == "isek_client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -3,11 +3,15 @@ Shared message formats between client and server
 This should match the formats in agent_server/shared/message_formats.py
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+import itertools
 import uuid
-import json
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -22,105 +26,97 @@ class AgentConfig:
     address: str = ""   # URL from node metadata
 
 
-@dataclass
-class ChatMessage:
-    """Standard chat message format"""
-    type: str = "chat"
-    session_id: str = ""
-    user_id: str = ""  # client's node_id
-    messages: List[Dict[str, Any]] = field(default_factory=list)
-    system_prompt: str = ""
-    user_message: str = ""
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
-    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+# Message builders write the dict straight to orjson. Field layout matches
+# agent_server/shared/message_formats.py.
 
+# request_id only correlates a reply with its request, so a per-process tag plus a
+# counter is enough (next() on itertools.count is atomic under the GIL)
+_request_tag = uuid.uuid4().hex[:12]
+_request_counter = itertools.count()
 
-@dataclass
-class SessionLifecycleMessage:
-    """Session lifecycle message format"""
-    type: str = "session_lifecycle"
-    session_id: str = ""
-    user_id: str = ""  # client's node_id
-    action: str = ""  # created, deleted, cleared
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
-    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
+# orjson.Fragment (3.9+) embeds already serialized JSON without re-parsing it. Older releases
+# lack it, so the history is decoded and re-encoded instead of failing every chat send.
+if hasattr(orjson, "Fragment"):
+    _embed_json = orjson.Fragment
+else:
+    logger.warning("orjson %s has no Fragment (needs >= 3.9), chat history will be re-encoded",
+                   getattr(orjson, "__version__", "?"))
+    _embed_json = orjson.loads
 
-@dataclass
-class TaskMessage:
-    """Task execution message format"""
-    type: str = "task"
-    session_id: str = ""
-    user_id: str = ""  # client's node_id
-    task_type: str = ""
-    task_data: Dict[str, Any] = field(default_factory=dict)
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
-    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+def _next_request_id() -> str:
+    return f"{_request_tag}-{next(_request_counter)}"
+
+
+def _timestamp() -> str:
+    """Send time as an ISO-8601 string, like the server's message formats"""
+    return datetime.now().isoformat()
 
 
 def create_chat_message_json(session_id: str, user_id: str, messages: List[Dict], 
-                            system_prompt: str = "", user_message: str = "") -> str:
-    """Create a standardized chat message JSON"""
-    msg = ChatMessage(
-        session_id=session_id,
-        user_id=user_id,
-        messages=messages,
-        system_prompt=system_prompt,
-        user_message=user_message
-    )
-    return json.dumps({
-        "type": msg.type,
-        "session_id": msg.session_id,
-        "user_id": msg.user_id,
-        "messages": msg.messages,
-        "system_prompt": msg.system_prompt,
-        "user_message": msg.user_message,
-        "timestamp": msg.timestamp,
-        "request_id": msg.request_id
-    })
+                            system_prompt: str = "", user_message: str = "",
+                            messages_json: Optional[str] = None) -> str:
+    """Create a standardized chat message JSON
+
+    messages_json, when given, is an already serialized JSON array used in place of messages.
+    """
+    return orjson.dumps({
+        "type": "chat",
+        "session_id": session_id,
+        "user_id": user_id,  # client's node_id
+        "messages": _embed_json(messages_json) if messages_json is not None else messages,
+        "system_prompt": system_prompt,
+        "user_message": user_message,
+        "timestamp": _timestamp(),
+        "request_id": _next_request_id()
+    }).decode()
 
 
 def create_session_lifecycle_message_json(session_id: str, user_id: str, action: str) -> str:
     """Create a standardized session lifecycle message JSON"""
-    msg = SessionLifecycleMessage(
-        session_id=session_id,
-        user_id=user_id,
-        action=action
-    )
-    return json.dumps({
-        "type": msg.type,
-        "session_id": msg.session_id,
-        "user_id": msg.user_id,
-        "action": msg.action,
-        "timestamp": msg.timestamp,
-        "request_id": msg.request_id
-    })
+    return orjson.dumps({
+        "type": "session_lifecycle",
+        "session_id": session_id,
+        "user_id": user_id,
+        "action": action,  # created, deleted, cleared
+        "timestamp": _timestamp(),
+        "request_id": _next_request_id()
+    }).decode()
+
+
+def create_session_lifecycle_batch_json(user_id: str, events: List[Dict[str, str]]) -> str:
+    """Create a batched session lifecycle message JSON
+
+    events is a list of {"session_id": ..., "action": ...} dicts for the same agent node.
+    """
+    return orjson.dumps({
+        "type": "session_lifecycle_batch",
+        "user_id": user_id,
+        "events": events,
+        "timestamp": _timestamp(),
+        "request_id": _next_request_id()
+    }).decode()
 
 
 def create_task_message_json(session_id: str, user_id: str, task_type: str, task_data: Dict[str, Any]) -> str:
     """Create a standardized task message JSON"""
-    msg = TaskMessage(
-        session_id=session_id,
-        user_id=user_id,
-        task_type=task_type,
-        task_data=task_data
-    )
-    return json.dumps({
-        "type": msg.type,
-        "session_id": msg.session_id,
-        "user_id": msg.user_id,
-        "task_type": msg.task_type,
-        "task_data": msg.task_data,
-        "timestamp": msg.timestamp,
-        "request_id": msg.request_id
-    })
+    return orjson.dumps({
+        "type": "task",
+        "session_id": session_id,
+        "user_id": user_id,
+        "task_type": task_type,
+        "task_data": task_data,
+        "timestamp": _timestamp(),
+        "request_id": _next_request_id()
+    }).decode()
 
 
 def parse_agent_response(response_json: str) -> Dict[str, Any]:
     """Parse standardized agent response"""
     try:
         # Handle empty or None responses
-        if not response_json or response_json.strip() == "":
+        if not response_json or not response_json.strip():
             return {
                 "success": False,
                 "content": "",
@@ -141,7 +137,7 @@ def parse_agent_response(response_json: str) -> Dict[str, Any]:
                 "error": response_json.strip()
             }
         
-        data = json.loads(response_json)
+        data = orjson.loads(response_json)
         return {
             "success": data.get("success", False),
             "content": data.get("content", ""),
@@ -150,10 +146,8 @@ def parse_agent_response(response_json: str) -> Dict[str, Any]:
             "request_id": data.get("request_id", ""),
             "error": data.get("error", "")
         }
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         # Log the raw response for debugging
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"Failed to parse agent response as JSON. Raw response: {repr(response_json)}")
         
         return {
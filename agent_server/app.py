@@ -4,8 +4,9 @@ ISEK Agent Server
 Session management server using ISEK node communication
 """
 
+import functools
 import logging
-import json
+import orjson
 import os
 from isek.node.etcd_registry import EtcdRegistry
 from isek.node.node_v2 import Node
@@ -18,11 +19,12 @@ from modules import DefaultSessionManager, DefaultTaskManager, DefaultMessageHan
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from config.json"""
+    """Load configuration from config.json (parsed once per process)"""
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-    with open(config_path, 'r') as f:
-        return json.load(f)
+    with open(config_path, 'rb') as f:
+        return orjson.loads(f.read())
 
 def main():
     """Initialize and start the ISEK agent server"""
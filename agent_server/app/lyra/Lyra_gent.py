@@ -1,6 +1,6 @@
 import os
 import sys
-import json
+import orjson
 from dotenv import load_dotenv
 from isek.agent.isek_agent import IsekAgent
 from isek.models.openai import OpenAIModel
@@ -27,13 +27,13 @@ def load_config():
     # Try local Lyra config first
     local_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
     if os.path.exists(local_config_path):
-        with open(local_config_path, 'r') as f:
-            return json.load(f)
+        with open(local_config_path, 'rb') as f:
+            return orjson.loads(f.read())
     
     # Fallback to main config
     main_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'config.json')
-    with open(main_config_path, 'r') as f:
-        return json.load(f)
+    with open(main_config_path, 'rb') as f:
+        return orjson.loads(f.read())
 
 def main():
     """
@@ -47,10 +47,27 @@ class MessageMapper:
         self.conn.commit()
         return message
     
+    def create_messages(self, messages: List[Message]) -> List[Message]:
+        """批量创建消息，一次提交"""
+        cursor = self.conn.cursor()
+        for message in messages:
+            message.content = json.dumps(message.content)
+            message.tool = json.dumps(message.tool)
+        cursor.executemany('''
+            INSERT INTO message (
+                id, sessionId, content, tool, role, timestamp, creatorId
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (m.id, m.sessionId, m.content, m.tool, m.role, m.timestamp, m.creatorId)
+            for m in messages
+        ])
+        self.conn.commit()
+        return messages
+    
     def get_messages_by_session(self, session_id: str) -> List[Message]:
         """根据会话ID获取所有消息"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM message WHERE sessionId = ? ORDER BY timestamp', (session_id,))
+        cursor.execute('SELECT * FROM message WHERE sessionId = ? ORDER BY timestamp, rowid', (session_id,))
         messages = []
         for row in cursor.fetchall():
             message = Message.from_dict(row)
@@ -59,6 +76,18 @@ class MessageMapper:
             messages.append(message)
         return messages
     
+    def get_recent_messages(self, session_id: str, limit: int) -> List[Message]:
+        """根据会话ID获取最近的limit条消息，按时间正序返回"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM message WHERE sessionId = ? ORDER BY timestamp DESC, rowid DESC LIMIT ?', (session_id, limit))
+        messages = []
+        for row in reversed(cursor.fetchall()):
+            message = Message.from_dict(row)
+            message.content = json.loads(message.content)
+            message.tool = json.loads(message.tool)
+            messages.append(message)
+        return messages
+    
     def delete_messages_by_session(self, session_id: str) -> bool:
         """根据会话ID删除所有消息"""
         cursor = self.conn.cursor()
@@ -74,6 +74,18 @@ class SessionMapper:
         self.conn.commit()
         return cursor.rowcount > 0
 
+    def touch_or_create(self, session_id: str, creator_id: str, now: str) -> Optional[Session]:
+        """获取会话并更新updatedAt，不存在则创建（单条upsert）；会话属于其他用户时返回None"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO session (id, title, createdAt, updatedAt, messageCount, creatorId)
+            VALUES (?, '', ?, ?, 0, ?)
+            ON CONFLICT(id) DO UPDATE SET updatedAt = excluded.updatedAt
+            WHERE session.creatorId = excluded.creatorId
+        ''', (session_id, now, now, creator_id))
+        self.conn.commit()
+        return self.get_by_id(session_id, creator_id)
+
     def get_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
         """根据ID获取session"""
         cursor = self.conn.cursor()
@@ -39,6 +39,14 @@ class BaseSessionManager(ABC):
     def create_message(self, message: Message, creator_id: str) -> Message:
         """Create a new message in a session"""
         pass
+    
+    def get_recent_messages(self, session_id: str, creator_id: str, limit: int) -> List[Message]:
+        """Get the last `limit` messages in a session, oldest first"""
+        return self.get_session_messages(session_id, creator_id)[-limit:]
+    
+    def create_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages at once (e.g. one conversation turn)"""
+        return [self.create_message(message, creator_id) for message in messages]
 
 
 class BaseTaskManager(ABC):
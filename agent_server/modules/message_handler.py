@@ -15,6 +15,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from shared import create_agent_response
 
+# Number of previous session messages included in the agent prompt
+HISTORY_WINDOW = 10
+
 
 class DefaultMessageHandler(BaseMessageHandler):
     """Default implementation of message handling"""
@@ -85,6 +88,12 @@ class DefaultMessageHandler(BaseMessageHandler):
                 if field not in data:
                     raise ValueError(f"session_lifecycle message missing required field: {field}")
                     
+        elif msg_type == "session_lifecycle_batch":
+            if "user_id" not in data:
+                raise ValueError("session_lifecycle_batch missing required field: user_id")
+            if not isinstance(data.get("events"), list):
+                raise ValueError("session_lifecycle_batch missing required field: events")
+                    
         elif msg_type == "task":
             if "task_type" not in data:
                 raise ValueError("task message missing required field: task_type")
@@ -123,14 +132,12 @@ class DefaultMessageHandler(BaseMessageHandler):
             
             log.info(f"Chat received: user='{actual_user}' session='{session_short}' msg='{msg_preview}'")
             
-            # Save user message to session if session manager available
-            if self.session_manager and session_id:
-                self._save_user_message(session_id, user_message, actual_user)
-            
-            # Get session history for context if available
+            # Get recent history for context; the user message is saved together with the reply below
             session_history = []
+            user_entry = None
             if self.session_manager and session_id:
-                session_history = self._get_session_history(session_id, actual_user)
+                user_entry = self._new_message(session_id, user_message, "user", actual_user)
+                session_history = self._get_session_history(session_id, actual_user, limit=HISTORY_WINDOW)
             
             # Agent runner is required - no fallbacks
             if not self.agent_runner:
@@ -145,9 +152,10 @@ class DefaultMessageHandler(BaseMessageHandler):
             agent_response = self.agent_runner(original_prompt)
             log.info(f"Agent response: {agent_response[:100]}...")
             
-            # Save response to session
-            if self.session_manager and session_id:
-                self._save_agent_message(session_id, agent_response, actual_user)
+            # Save the whole turn (user message + response) to session in one write
+            if user_entry is not None:
+                agent_entry = self._new_message(session_id, agent_response, "assistant", actual_user)
+                self._save_turn(user_entry, agent_entry, actual_user)
             
             # Parse agent response if it's JSON
             try:
@@ -180,12 +188,10 @@ class DefaultMessageHandler(BaseMessageHandler):
         # If we have session history, create a more complete prompt
         if session_history:
             # Convert session history to client-compatible format
-            messages = []
-            for msg in session_history[-10:]:  # Last 10 messages for context
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            messages = [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in session_history[-HISTORY_WINDOW:]  # Last messages for context
+            ]
             
             # Add current user message
             messages.append({
@@ -208,71 +214,56 @@ class DefaultMessageHandler(BaseMessageHandler):
         return user_message
     
     
-    def _save_user_message(self, session_id: str, content: str, user_id: str):
-        """Save user message to session"""
-        try:
-            from mapper.models import Message
-            import uuid
-            message = Message(
-                id=str(uuid.uuid4()),
-                sessionId=session_id,
-                content=content,
-                tool="",  # Empty for regular messages
-                role="user",
-                timestamp=datetime.now().isoformat(),
-                creatorId=user_id
-            )
-            result = self.session_manager.create_message(message, user_id)
-            log.info(f"User message saved to session {session_id[:12]}: {content[:50]}...")
-            return result
-        except Exception as e:
-            log.error(f"Error saving user message: {e}")
-            raise
+    def _new_message(self, session_id: str, content: str, role: str, user_id: str):
+        """Build a session message stamped with the current time"""
+        from mapper.models import Message
+        return Message(
+            id=str(uuid.uuid4()),
+            sessionId=session_id,
+            content=content,
+            tool="",  # Empty for regular messages
+            role=role,
+            timestamp=datetime.now().isoformat(),
+            creatorId=user_id
+        )
     
-    def _save_agent_message(self, session_id: str, content: str, user_id: str):
-        """Save agent message to session"""
+    def _save_turn(self, user_entry, agent_entry, user_id: str):
+        """Save the user message and agent reply of one turn to session"""
         try:
-            from mapper.models import Message
-            import uuid
-            message = Message(
-                id=str(uuid.uuid4()),
-                sessionId=session_id,
-                content=content,
-                tool="",  # Empty for regular messages  
-                role="assistant",
-                timestamp=datetime.now().isoformat(),
-                creatorId=user_id
-            )
-            result = self.session_manager.create_message(message, user_id)
-            log.info(f"Agent message saved to session {session_id[:12]}: {content[:50]}...")
+            result = self.session_manager.create_messages([user_entry, agent_entry], user_id)
+            log.info(f"Turn saved to session {user_entry.sessionId[:12]}: {str(user_entry.content)[:50]}...")
             return result
         except Exception as e:
-            log.error(f"Error saving agent message: {e}")
+            log.error(f"Error saving conversation turn: {e}")
             raise
     
-    def _get_session_history(self, session_id: str, user_id: str) -> List[Dict]:
-        """Get session chat history in client-compatible ChatMessage format"""
+    def _get_session_history(self, session_id: str, user_id: str, limit: int = None) -> List[Dict]:
+        """Get session chat history in client-compatible ChatMessage format (only the last `limit` messages if given)"""
         try:
-            messages = self.session_manager.get_session_messages(session_id, user_id)
-            
-            # Convert to client ChatMessage format (matching types.ts)
-            history = []
-            for msg in messages:
-                # Ensure we match the exact ChatMessage interface
-                chat_message = {
-                    "id": getattr(msg, 'id', str(uuid.uuid4())),
-                    "sessionId": msg.sessionId,
-                    "content": msg.content,
-                    "role": msg.role,  # 'user' | 'assistant'
-                    "timestamp": msg.timestamp
-                }
-                history.append(chat_message)
-            
-            return history
+            if limit is None:
+                messages = self.session_manager.get_session_messages(session_id, user_id)
+            else:
+                messages = self.session_manager.get_recent_messages(session_id, user_id, limit) if limit > 0 else []
+            return self._format_history(messages)
         except Exception as e:
             log.error(f"Error getting session history: {e}")
             return []
     
+    def _format_history(self, messages: List) -> List[Dict]:
+        """Convert stored messages to client ChatMessage format (matching types.ts)"""
+        history = []
+        for msg in messages:
+            # Ensure we match the exact ChatMessage interface
+            chat_message = {
+                "id": getattr(msg, 'id', str(uuid.uuid4())),
+                "sessionId": msg.sessionId,
+                "content": msg.content,
+                "role": msg.role,  # 'user' | 'assistant'
+                "timestamp": msg.timestamp
+            }
+            history.append(chat_message)
+        return history
+    
 
     async def handle_session_lifecycle(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle session lifecycle events"""
@@ -62,4 +62,20 @@ class DefaultSessionManager(BaseSessionManager):
             return self.session_service.create_message(message, creator_id)
         except Exception as e:
             log.error(f"Error creating message: {e}")
+            raise
+    
+    def get_recent_messages(self, session_id: str, creator_id: str, limit: int) -> List[Message]:
+        """Get the last `limit` messages in a session (creating / touching the session)"""
+        try:
+            return self.session_service.touch_session_and_get_recent(session_id, creator_id, limit)
+        except Exception as e:
+            log.error(f"Error getting session messages: {e}")
+            return []
+    
+    def create_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages in one transaction"""
+        try:
+            return self.session_service.create_messages(messages, creator_id)
+        except Exception as e:
+            log.error(f"Error creating messages: {e}")
             raise
\ No newline at end of file
@@ -38,9 +38,8 @@ class SessionService:
         if not creator_id:
             raise ValueError("creator_id is required")
             
-        # 先验证会话是否属于该用户
-        sessions = self.session_mapper.get_sessions(creator_id)
-        if not any(s.id == session_id for s in sessions):
+        # 先验证会话是否属于该用户（按主键查询单条，无需列出全部会话）
+        if self.session_mapper.get_by_id(session_id, creator_id) is None:
             raise PermissionError("Unauthorized access to session")
             
         # 先删除会话中的消息
@@ -53,13 +52,23 @@ class SessionService:
         if not creator_id:
             raise ValueError("creator_id is required")
             
-        # 验证会话是否属于该用户
-        sessions = self.session_mapper.get_sessions(creator_id)
-        if not any(s.id == session_id for s in sessions):
+        # 验证会话是否属于该用户（按主键查询单条，无需列出全部会话）
+        if self.session_mapper.get_by_id(session_id, creator_id) is None:
             raise PermissionError("Unauthorized access to session messages")
             
         return self.message_mapper.get_messages_by_session(session_id)
     
+    def touch_session_and_get_recent(self, session_id: str, creator_id: str, limit: int) -> List[Message]:
+        """获取或创建会话并更新活跃时间，返回最近的limit条消息（按时间正序），需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        
+        # 一次upsert完成 获取/创建/更新活跃时间，会话属于其他用户时返回None
+        if self.session_mapper.touch_or_create(session_id, creator_id, datetime.now().isoformat()) is None:
+            raise PermissionError("Unauthorized access to session messages")
+        
+        return self.message_mapper.get_recent_messages(session_id, limit)
+    
     def create_message(self, message: Message, creator_id: str) -> Message:
         """创建消息，需验证会话属于该用户"""
         if not creator_id:
@@ -77,6 +86,18 @@ class SessionService:
             message.timestamp = datetime.now().isoformat()
             
         return self.message_mapper.create_message(message)
+    
+    def create_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """批量创建消息（一次提交），例如一轮对话的用户消息和回复"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        for message in messages:
+            if not message.sessionId:
+                raise ValueError("session_id is required")
+            if not message.timestamp:
+                message.timestamp = datetime.now().isoformat()
+        
+        return self.message_mapper.create_messages(messages)
 
 #
 # from datetime import datetime
@@ -34,6 +34,8 @@ class SessionAdapter(Adapter):
         self.session_manager = session_manager
         self.task_manager = task_manager 
         self.message_handler = message_handler or DefaultMessageHandler()
+        self._adapter_card: Optional[AdapterCard] = None  # built on first get_adapter_card()
+        self._agent_config_json: Dict[str, str] = {}  # node_id -> json.dumps(get_agent_config(node_id))
         
         log.info(f"SessionAdapter initialized: agent={type(agent).__name__ if agent else None}, "
                 f"plugins=[{', '.join([p for p in ['session', 'task'] if getattr(self, f'{p}_manager')])}]")
@@ -70,11 +72,13 @@ class SessionAdapter(Adapter):
         message_type = parsed_data.get("type")
         
         if self.session_manager:
-            if message_type in ["chat", "session_lifecycle"]:
+            if message_type in ["chat", "session_lifecycle", "session_lifecycle_batch"]:
                 if message_type == "chat":
                     self.message_handler.set_agent_runner(self._team_run)
                     self.message_handler.set_session_manager(self.session_manager)
                     response_data = self.message_handler.handle_chat_message(parsed_data)
+                elif message_type == "session_lifecycle_batch":
+                    response_data = self._handle_session_lifecycle_batch(parsed_data)
                 else:
                     response_data = self._handle_session_lifecycle(parsed_data)
                 return self.message_handler.format_response(response_data)
@@ -102,7 +106,7 @@ class SessionAdapter(Adapter):
             return self._error_response("node_id required")
         
         config = self.get_agent_config(node_id)
-        response = create_agent_response(success=True, content=json.dumps(config), **config)
+        response = create_agent_response(success=True, content=self._get_agent_config_json(node_id), **config)
         return self.message_handler.format_response(response)
 
     def _error_response(self, error: str) -> str:
@@ -130,6 +134,30 @@ class SessionAdapter(Adapter):
             log.error(f"Error handling session lifecycle: {e}")
             return create_agent_response(success=False, error=str(e))
 
+    def _handle_session_lifecycle_batch(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle batched lifecycle events; each event is processed on its own so one bad event does not fail the rest"""
+        try:
+            data = parsed_data["data"]
+            user_id = data.get("user_id", "")
+            results = []
+            for event in data.get("events", []):
+                if not isinstance(event, dict):
+                    results.append(create_agent_response(success=False, error=f"Invalid session event: {event!r}"))
+                    continue
+                results.append(self._handle_session_lifecycle({"data": {**event, "user_id": user_id}}))
+            failed = [r["error"] for r in results if not r["success"]]
+            
+            return create_agent_response(
+                success=not failed,
+                content=f"{len(results) - len(failed)} of {len(results)} session events processed",
+                error="; ".join(failed),
+                request_id=data.get("request_id", "")
+            )
+            
+        except Exception as e:
+            log.error(f"Error handling session lifecycle batch: {e}")
+            return create_agent_response(success=False, error=str(e))
+
     def _handle_task_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             data = parsed_data["data"]
@@ -161,7 +189,7 @@ class SessionAdapter(Adapter):
             
             return {
                 "success": True,
-                "content": json.dumps(agent_config),
+                "content": self._get_agent_config_json(node_id),
                 **agent_config
             }
             
@@ -170,6 +198,12 @@ class SessionAdapter(Adapter):
             return {"success": False, "error": str(e)}
 
     def get_adapter_card(self) -> AdapterCard:
+        # The card only depends on the wrapped agent, so build it once and reuse it for every probe
+        if self._adapter_card is None:
+            self._adapter_card = self._build_adapter_card()
+        return self._adapter_card
+
+    def _build_adapter_card(self) -> AdapterCard:
         if self.agent and hasattr(self.agent, 'get_adapter_card'):
             agent_card = self.agent.get_adapter_card()
             return AdapterCard(
@@ -207,6 +241,15 @@ class SessionAdapter(Adapter):
             "routine": adapter_card.routine
         }
 
+    def _get_agent_config_json(self, node_id: str) -> str:
+        # Config only varies by node_id (the card is cached), so encode it once per node
+        config_json = self._agent_config_json.get(node_id)
+        if config_json is None:
+            if len(self._agent_config_json) >= 64:  # node_id comes from the request, keep the cache bounded
+                self._agent_config_json.clear()
+            config_json = self._agent_config_json[node_id] = json.dumps(self.get_agent_config(node_id))
+        return config_json
+
     def __getattr__(self, name: str):
         if self.session_manager and hasattr(self.session_manager, name):
             return getattr(self.session_manager, name)
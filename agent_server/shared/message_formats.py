@@ -8,7 +8,7 @@ from datetime import datetime
 import uuid
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """Standard chat message format"""
     type: str = "chat"
@@ -21,7 +21,7 @@ class ChatMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionLifecycleMessage:
     """Session lifecycle message format"""
     type: str = "session_lifecycle"
@@ -32,7 +32,7 @@ class SessionLifecycleMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
-@dataclass
+@dataclass(slots=True)
 class TaskMessage:
     """Task execution message format"""
     type: str = "task"
@@ -44,7 +44,7 @@ class TaskMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentResponse:
     """Standard agent response format"""
     success: bool = True
@@ -55,7 +55,7 @@ class AgentResponse:
     error: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentConfigFormat:
     """Agent configuration format matching client expectations"""
     id: str = ""